@@ -1,14 +1,32 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import calendar
 import argparse
-import time
+import sys
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 try:
     from zoneinfo import ZoneInfo
 except Exception:  # pragma: no cover
     ZoneInfo = None
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None
+try:
+    from requests_cache import CachedSession
+except Exception:  # pragma: no cover
+    CachedSession = None
 import uuid
 
+# Resolve the local zone once; None means fall back to fixed CET/CEST offsets
+try:
+    _STOCKHOLM_TZ = ZoneInfo("Europe/Stockholm") if ZoneInfo is not None else None
+except Exception:
+    _STOCKHOLM_TZ = None
+
 # Known course UUIDs (Sweetspot)
 COURSE_UUIDS = {
     "brållsta 18 hål": "292e2543-f661-403f-b1d6-a5086d251061",
@@ -25,10 +43,18 @@ COURSE_UUIDS = {
     "stannum": "c4d2c938-43d7-4b07-9ddc-c679c769d28c",
     "waxholm": "410fdd67-a108-4b3f-8058-1ff66fc061c2",
 }
+_UUID_TO_NAME = {u: n for n, u in COURSE_UUIDS.items()}
+_TITLES = {n: n.title() for n in COURSE_UUIDS}
+
+# Category names (normalized) that mark a tee time as unbookable
+_MAINT = "banunderhåll"
+_FULL_NAMES = frozenset({"fullbokad", "fullbokat", "fullbokade"})
 
 def _norm(s: str) -> str:
     return (s or "").strip().lower()
 
+_NORM_COURSES = {_norm(n): u for n, u in COURSE_UUIDS.items()}
+
 def resolve_course_uuid(course: str) -> str:
     val = (course or "").strip()
     try:
@@ -37,15 +63,31 @@ def resolve_course_uuid(course: str) -> str:
     except Exception:
         pass
     key = _norm(val)
-    if key in COURSE_UUIDS:
-        return COURSE_UUIDS[key]
-    for name, cuuid in COURSE_UUIDS.items():
-        if _norm(name).startswith(key) or key.startswith(_norm(name)):
+    if key in _NORM_COURSES:
+        return _NORM_COURSES[key]
+    for name, cuuid in _NORM_COURSES.items():
+        if name.startswith(key) or key.startswith(name):
             return cuuid
     raise KeyError(f"Unknown course: {course}. Known: {', '.join(COURSE_UUIDS.keys())}")
 
+_TZ_CET = timezone(timedelta(hours=1))
+_TZ_CEST = timezone(timedelta(hours=2))
+
+@lru_cache(maxsize=8)
+def _dst_bounds(y: int):
+    # Last Sunday of March and of October for the given year
+    last_dom_mar = calendar.monthrange(y, 3)[1]
+    start_dst = last_dom_mar - ((datetime(y, 3, last_dom_mar).weekday() - 6) % 7)
+    last_dom_oct = calendar.monthrange(y, 10)[1]
+    end_dst = last_dom_oct - ((datetime(y, 10, last_dom_oct).weekday() - 6) % 7)
+    return datetime(y, 3, start_dst).date(), datetime(y, 10, end_dst).date()
+
+def _stockholm_fixed_tz(local_date: datetime):
+    start_dst, end_dst = _dst_bounds(local_date.year)
+    return _TZ_CEST if start_dst <= local_date.date() <= end_dst else _TZ_CET
+
 class SweetspotClient:
-    def __init__(self, api_origin: str | None = None, retries: int = 2, timeout: int = 20):
+    def __init__(self, api_origin: str | None = None, retries: int = 2, timeout: int = 20, pool_size: int = 32, cache_ttl: int = 30):
         self.api_origins = [
             api_origin.strip() if api_origin else "https://platform.sweetspot.io",
             "https://platform.sweetspot.io",
@@ -55,7 +97,36 @@ class SweetspotClient:
         self.api_origins = list(dict.fromkeys(self.api_origins))
         self.retries = max(0, int(retries))
         self.timeout = max(1, int(timeout))
-        self.session = requests.Session()
+        # Serve back-to-back runs from a short-lived cache in the user cache dir
+        if CachedSession is not None and cache_ttl > 0:
+            self.session = CachedSession(
+                "teetime_cache", use_cache_dir=True, expire_after=int(cache_ttl), allowable_methods=("GET",)
+            )
+            # Expired rows are never dropped automatically; purge them so the file doesn't grow
+            try:
+                self.session.cache.delete(expired=True)
+            except Exception:
+                pass
+        else:
+            self.session = requests.Session()
+        # Size the connection pool for concurrent fetches so sockets are reused;
+        # keep one host pool per distinct API origin (at most 3).
+        # Retries happen here only (per origin), and only for connection errors
+        # and 500/502/503/504; anything else makes fetch_tee_times fall back to
+        # the next origin. Retry-After is ignored so a worker can't stall on it.
+        adapter = HTTPAdapter(
+            pool_connections=len(self.api_origins),
+            pool_maxsize=max(1, int(pool_size)),
+            max_retries=Retry(
+                total=self.retries,
+                backoff_factor=0.5,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=frozenset(["GET"]),
+                respect_retry_after_header=False,
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("https://", adapter)
         self.session.headers.update({
             "Accept": "application/json, text/plain, */*",
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0 Safari/537.36",
@@ -64,81 +135,117 @@ class SweetspotClient:
             "Accept-Language": "sv-SE,sv;q=0.9,en-US;q=0.8,en;q=0.7",
         })
 
-    def _stockholm_fixed_tz(self, local_date: datetime):
-        y = local_date.year
-        last_dom_mar = calendar.monthrange(y, 3)[1]
-        d_mar = datetime(y, 3, last_dom_mar)
-        start_dst = last_dom_mar - ((d_mar.weekday() - 6) % 7)
-        last_dom_oct = calendar.monthrange(y, 10)[1]
-        d_oct = datetime(y, 10, last_dom_oct)
-        end_dst = last_dom_oct - ((d_oct.weekday() - 6) % 7)
-        in_dst = datetime(y, 3, start_dst).date() <= local_date.date() <= datetime(y, 10, end_dst).date()
-        hours = 2 if in_dst else 1
-        return timezone(timedelta(hours=hours))
-
     def _build_api_window_utc(self, date_str: str):
         naive = datetime.strptime(date_str, "%Y-%m-%d")
-        if ZoneInfo is not None:
-            try:
-                tz = ZoneInfo("Europe/Stockholm")
-            except Exception:
-                tz = self._stockholm_fixed_tz(naive)
-        else:
-            tz = self._stockholm_fixed_tz(naive)
+        tz = _STOCKHOLM_TZ or _stockholm_fixed_tz(naive)
         local_day_start = naive.replace(tzinfo=tz)
         local_day_end = (local_day_start + timedelta(days=1)) - timedelta(milliseconds=1)
         start_utc = local_day_start.astimezone(timezone.utc)
         end_utc = local_day_end.astimezone(timezone.utc)
-        to_iso = lambda dt: dt.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+        to_iso = lambda dt: f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}T{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}.{dt.microsecond // 1000:03d}Z"
         return to_iso(start_utc), to_iso(end_utc)
 
-    def fetch_tee_times(self, course_uuid: str, date_str: str, limit: int = 9999):
+    def fetch_tee_times(self, course_uuid: str, date_str: str, limit: int = 9999, end_date_str: str | None = None, page: int = 1):
         after_iso, before_iso = self._build_api_window_utc(date_str)
+        if end_date_str and end_date_str != date_str:
+            before_iso = self._build_api_window_utc(end_date_str)[1]
         params = {
             "course.uuid": course_uuid,
             "from[after]": after_iso,
             "from[before]": before_iso,
             "limit": str(limit),
             "order[from]": "asc",
-            "page": "1",
+            "page": str(page),
         }
         last_error = None
         for origin in self.api_origins:
             url = f"{origin}/api/tee-times"
-            for attempt in range(self.retries + 1):
-                try:
-                    r = self.session.get(url, params=params, timeout=self.timeout)
-                    r.raise_for_status()
-                    ctype = (r.headers.get("Content-Type") or "").lower()
-                    if "application/json" not in ctype:
-                        preview = r.text[:160].replace("\n", " ").replace("\r", " ").strip()
-                        raise ValueError(f"Unexpected content-type '{ctype or 'unknown'}' from {origin}. Preview: {preview}")
-                    data = r.json()
-                    items = data.get("data") if isinstance(data, dict) else data
-                    return items or []
-                except Exception as e:
-                    last_error = e
-                    # Retry only on this origin first
-                    if attempt < self.retries:
-                        time.sleep(0.5 * (attempt + 1))
-                        continue
-                    break
+            try:
+                r = self.session.get(url, params=params, timeout=self.timeout)
+                r.raise_for_status()
+                ctype = (r.headers.get("Content-Type") or "").lower()
+                if "application/json" not in ctype:
+                    preview = r.text[:160].replace("\n", " ").replace("\r", " ").strip()
+                    raise ValueError(f"Unexpected content-type '{ctype or 'unknown'}' from {origin}. Preview: {preview}")
+                data = orjson.loads(r.content) if orjson is not None else r.json()
+                items = data.get("data") if isinstance(data, dict) else data
+                return items or []
+            except Exception as e:
+                # Transport-level retries already ran in the adapter; try the next origin
+                last_error = e
         raise RuntimeError(f"Failed to fetch tee times from API origins {self.api_origins}: {last_error}")
 
+    def fetch_tee_times_range(self, course_uuid: str, first: str, last: str, limit: int = 9999) -> dict[str, list]:
+        # One window covering first..last, bucketed by local (Stockholm) day (YYYY-MM-DD keys)
+        first_day = datetime.strptime(first, "%Y-%m-%d").date()
+        last_day = datetime.strptime(last, "%Y-%m-%d").date()
+        buckets = {(first_day + timedelta(days=i)).isoformat(): [] for i in range((last_day - first_day).days + 1)}
+        page, prev_first = 1, None
+        while True:
+            items = self.fetch_tee_times(course_uuid, first, limit=limit, end_date_str=last, page=page)
+            # Stop if the server ignores paging and repeats the previous page
+            if not items or items[0] == prev_first:
+                break
+            for it in items:
+                start_iso = it.get("from") or it.get("start")
+                if not start_iso:
+                    continue
+                bucket = buckets.get(_local_date(start_iso))
+                if bucket is not None:
+                    bucket.append(it)
+            # The server may cap page size below `limit`, so a short page only
+            # proves completeness for a single day (as one request per day did);
+            # multi-day windows keep paging until an empty or repeated page
+            if first == last and len(items) < limit:
+                break
+            page, prev_first = page + 1, items[0]
+        return buckets
+
+@lru_cache(maxsize=4096)
 def _to_local_hhmm(start_iso: str) -> str:
     dt_utc = datetime.fromisoformat(start_iso.replace("Z", "+00:00"))
-    tz_local = None
-    if ZoneInfo is not None:
-        try:
-            tz_local = ZoneInfo("Europe/Stockholm")
-        except Exception:
-            tz_local = None
+    tz_local = _STOCKHOLM_TZ
     if tz_local is None:
-        tz_local = SweetspotClient()._stockholm_fixed_tz(dt_utc)  # quick fallback instance
+        tz_local = _stockholm_fixed_tz(dt_utc)
     return dt_utc.astimezone(tz_local).strftime("%H:%M")
 
+@lru_cache(maxsize=64)
+def _utc_offset_minutes(date_str: str) -> int:
+    # Stockholm offset at local noon; tee times never straddle the 01:00 UTC DST switch
+    noon = datetime(int(date_str[0:4]), int(date_str[5:7]), int(date_str[8:10]), 12)
+    tz = _STOCKHOLM_TZ or _stockholm_fixed_tz(noon)
+    return int(noon.replace(tzinfo=tz).utcoffset().total_seconds()) // 60
+
+def _utc_minute_of_day(start_iso: str) -> int | None:
+    # Minute-of-day for UTC "YYYY-MM-DDTHH:MM..." strings; None for any other shape
+    if start_iso.endswith(("Z", "+00:00")) and start_iso[10:11] == "T" and start_iso[13:14] == ":":
+        hh, mm = start_iso[11:13], start_iso[14:16]
+        if hh.isdigit() and mm.isdigit():
+            return int(hh) * 60 + int(mm)
+    return None
+
+def _local_date(start_iso: str) -> str:
+    utc_min = _utc_minute_of_day(start_iso)
+    if utc_min is not None:
+        day = start_iso[:10]
+        if utc_min + _utc_offset_minutes(day) < 1440:
+            return day
+    dt_utc = datetime.fromisoformat(start_iso.replace("Z", "+00:00"))
+    return dt_utc.astimezone(_STOCKHOLM_TZ or _stockholm_fixed_tz(dt_utc)).strftime("%Y-%m-%d")
+
+def _consecutive_runs(date_list: list[str]) -> list[tuple[str, str]]:
+    # Group canonical YYYY-MM-DD dates into (first, last) runs of consecutive days
+    runs = []
+    for day in sorted({datetime.strptime(d, "%Y-%m-%d").date() for d in date_list}):
+        if runs and day - runs[-1][1] == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [(first.isoformat(), last.isoformat()) for first, last in runs]
+
 def _s(v): return v.strip().lower() if isinstance(v, str) else ""
 
+@lru_cache(maxsize=4096)
 def _tmin(hhmm: str | None) -> int | None:
     if not hhmm: return None
     try:
@@ -155,51 +262,72 @@ if __name__ == "__main__":
     parser.add_argument("-a", "--after", help="Earliest time HH:MM to include (optional)")
     parser.add_argument("-b", "--before", help="Latest time HH:MM to include (optional)")
     parser.add_argument("--api-origin", default="https://platform.sweetspot.io", help="Primary API base origin (default: https://platform.sweetspot.io)")
-    parser.add_argument("--retries", type=int, default=2, help="Retries per request before failing (default: 2)")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per API origin on connection errors and HTTP 500/502/503/504 (default: 2)")
     parser.add_argument("--timeout", type=int, default=20, help="HTTP timeout seconds (default: 20)")
+    parser.add_argument("--cache-ttl", type=int, default=30, help="Seconds to reuse cached API responses; 0 disables (default: 30)")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent requests in flight (default: 16)")
     args = parser.parse_args()
 
     today = datetime.now().strftime("%Y-%m-%d")
     date_list = [d.strip() for d in (args.dates or today).split(",") if d.strip()]
-    client = SweetspotClient(api_origin=args.api_origin, retries=args.retries, timeout=args.timeout)
+    # Validate once and canonicalize to zero-padded YYYY-MM-DD
+    try:
+        date_list = [datetime.strptime(d, "%Y-%m-%d").date().isoformat() for d in date_list]
+    except ValueError as e:
+        parser.error(f"invalid --dates value (expected YYYY-MM-DD): {e}")
+    workers = max(1, args.workers)
+    client = SweetspotClient(api_origin=args.api_origin, retries=args.retries, timeout=args.timeout, pool_size=workers, cache_ttl=args.cache_ttl)
 
     after_min = _tmin(args.after)
     before_min = _tmin(args.before)
 
-    def in_window(hhmm: str) -> bool:
-        t = _tmin(hhmm)
+    def in_window(t: int | None) -> bool:
         if t is None: return False
         if after_min is not None and t < after_min: return False
         if before_min is not None and t > before_min: return False
         return True
 
-    # Helper to process one course+date and print formatted output
-    def process_course(course_label: str, cuuid: str, date_str: str):
-        items = client.fetch_tee_times(cuuid, date_str)
+    # Helper to filter one course+date result and print formatted output
+    def process_course(course_label: str, date_str: str, items):
+        offset = _utc_offset_minutes(date_str)
         out = []
         for it in (items or []):
             # Category may be a dict; normalize for checks
             cat = it.get("category") or {}
+            # Normalize inline (same as _s) to avoid a call per field in this loop
+            name = it.get("name")
+            name = name.strip().lower() if isinstance(name, str) else ""
             if isinstance(cat, dict):
-                # Skip maintenance
-                if _s(cat.get("name")) == "banunderhåll" or _s(cat.get("custom_name")) == "banunderhåll" or _s(it.get("name")) == "banunderhåll":
+                # Skip maintenance, fully booked and unbookable slots
+                cg = cat.get
+                custom_name = cg("custom_name")
+                custom_name = custom_name.strip().lower() if isinstance(custom_name, str) else ""
+                if (name == _MAINT or custom_name == _MAINT or custom_name in _FULL_NAMES
+                        or cg("tee_time_bookable") is False):
                     continue
-                if _s(cat.get("display")) == "full":
+                cat_name = cg("name")
+                display = cg("display")
+                if ((isinstance(cat_name, str) and cat_name.strip().lower() == _MAINT)
+                        or (isinstance(display, str) and display.strip().lower() == "full")):
                     continue
-                if _s(cat.get("custom_name")) in {"fullbokad", "fullbokat", "fullbokade"}:
-                    continue
-                if cat.get("tee_time_bookable") is False:
-                    continue
-            else:
+            elif (name or _s(cat)) == _MAINT:
                 # Fallback: legacy string category or name
-                if (_s(it.get("name")) or _s(it.get("category"))) == "banunderhåll":
-                    continue
+                continue
             start_iso = it.get("from") or it.get("start")
             if not start_iso:
                 continue
-            hhmm = _to_local_hhmm(start_iso)
-            if not in_window(hhmm):
-                continue
+            utc_min = _utc_minute_of_day(start_iso)
+            if utc_min is not None:
+                # UTC timestamp: shift by the day's offset, no datetime needed
+                t = (utc_min + offset) % 1440
+                if not in_window(t):
+                    continue
+                hhmm = f"{t // 60:02d}:{t % 60:02d}"
+            else:
+                hhmm = _to_local_hhmm(start_iso)
+                t = _tmin(hhmm)
+                if not in_window(t):
+                    continue
             avail = it.get("available_slots")
             if not isinstance(avail, int):
                 try:
@@ -213,26 +341,36 @@ if __name__ == "__main__":
                 except Exception:
                     max_slots = 4
             if avail >= args.players:
-                out.append((hhmm, avail, max_slots))
-        out.sort(key=lambda x: _tmin(x[0]) or 1_000_000)
-        # Print course title (Title Case)
-        title = course_label.title()
-        print(f"\n{title}")
+                out.append((t, hhmm, avail, max_slots))
+        # Minutes lead the tuple, so plain tuple ordering sorts by time
+        out.sort()
+        # Print course title (Title Case); one write per course block
+        title = _TITLES.get(course_label) or course_label.title()
+        lines = ["", title]
         if not out:
-            print(f"no match found for {title}")
+            lines.append(f"no match found for {title}")
         else:
-            for hhmm, avail, max_slots in out:
-                print(f"  {hhmm}  slots:{avail}/{max_slots}")
+            lines.extend(f"  {hhmm}  slots:{avail}/{max_slots}" for _, hhmm, avail, max_slots in out)
+        sys.stdout.write("\n".join(lines) + "\n")
 
     try:
         if args.course:
             cuuid = resolve_course_uuid(args.course)
-            label = next((n for n, u in COURSE_UUIDS.items() if u == cuuid), args.course)
-            for d in date_list:
-                process_course(label, cuuid, d)
+            label = _UUID_TO_NAME.get(cuuid, args.course)
+            courses = [(label, cuuid)]
         else:
-            for d in date_list:
-                for name, cuuid in COURSE_UUIDS.items():
-                    process_course(name, cuuid, d)
+            courses = list(COURSE_UUIDS.items())
+        if date_list:
+            # One request per (course, run of consecutive dates), all fetched
+            # concurrently; print in the original (date, course) order
+            jobs = [(label, cuuid, first, last) for label, cuuid in courses for first, last in _consecutive_runs(date_list)]
+            with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as ex:
+                futures = [(label, ex.submit(client.fetch_tee_times_range, cuuid, first, last)) for label, cuuid, first, last in jobs]
+                by_course = {label: {} for label, _ in courses}
+                for label, fut in futures:
+                    by_course[label].update(fut.result())
+                for d in date_list:
+                    for label, _ in courses:
+                        process_course(label, d, by_course[label][d])
     except Exception as e:
         print(f"Error: {e}")
\ No newline at end of file